@@ -1,36 +1,104 @@
-import discord,re,asyncio,enum,uuid,json,time,logging
+import discord,re,asyncio,enum,uuid,json,time,logging,operator,heapq,weakref
 from discord.ext import commands
 from discord import app_commands
 from typing import Optional,List,Dict,Tuple,Any,Union
-from datetime import datetime,timedelta
+from datetime import datetime,timedelta,date,timezone
 from functools import lru_cache
+from itertools import islice
+from collections import OrderedDict,deque,Counter
 
-from config.config import MAX_MESSAGES_PER_SEARCH,MESSAGES_PER_PAGE,EMBED_COLOR,CONCURRENT_SEARCH_LIMIT,SEARCH_ORDER_OPTIONS
+from config.config import MAX_MESSAGES_PER_SEARCH,MESSAGES_PER_PAGE,EMBED_COLOR,CONCURRENT_SEARCH_LIMIT,MAX_CONCURRENT_SEARCHES,SEARCH_ORDER_OPTIONS,THREAD_CACHE_TTL,THREAD_CACHE_SIZE,EARLY_STOP_PAGES,GUILD_CONCURRENT_SEARCHES
 from utils.helpers import truncate_text
 from utils.pagination import MultiEmbedPaginationView
 from utils.embed_helper import DiscordEmbedBuilder
 from utils.attachment_helper import AttachmentProcessor
 from utils.thread_stats import get_thread_stats
-from utils.search_query_parser import SearchQueryParser
+from utils.search_query_parser import SearchQueryParser,compile_keywords,compile_all_keywords
 
 logger=logging.getLogger('discord_bot.search')
 
+class ThreadRecord:
+    __slots__=('t','tid','ttl','tl','a','ca','ia','tags','url','c','cl','fm','fmid','la','rx','rp')
+    def __init__(self,th,s,m):
+        self.t,self.tid,self.ttl,self.tl,self.ca,self.ia,self.url=th,th.id,th.name,th.name.lower(),th.created_at,th.archived,th.jump_url
+        self.a,self.tags=getattr(th,'owner',None),tuple(t.name for t in getattr(th,'applied_tags',[]))
+        self.c,self.cl,self.fm,self.fmid=m.content if m else "",None,m,m.id if m else None
+        self.la,self.rx,self.rp=getattr(getattr(th,'last_message',None),'created_at',th.created_at),*s
+
 class ThreadCache:
-    def __init__(self,ttl=300):self._cache,self._stats_cache,self._ttl,self._last_cleanup={},{},ttl,datetime.now().timestamp()
+    def __init__(self,ttl=300,maxsize=10000):self._cache,self._stats_cache,self._ttl,self._max,self._last_cleanup=OrderedDict(),OrderedDict(),ttl,maxsize,time.monotonic()
     async def get_thread_stats(self,thread):
-        k,t=f"stats_{thread.id}",datetime.now().timestamp()
-        if k in self._stats_cache and t-self._stats_cache[k]['timestamp']<self._ttl:return self._stats_cache[k]['data']
-        try:stats=await get_thread_stats(thread);self._stats_cache[k]={'data':stats,'timestamp':t};return stats
-        except Exception as e:logger.error(f"[boundary:error] Stats fetch: {e}");return {'reaction_count':0,'reply_count':0}
-    def store(self,tid,data):self._cache[tid]={'data':data,'timestamp':datetime.now().timestamp()}
-    def get(self,tid):return self._cache[tid]['data'] if tid in self._cache and datetime.now().timestamp()-self._cache[tid]['timestamp']<self._ttl else None
-    async def cleanup(self):
-        t=datetime.now().timestamp()
+        t=time.monotonic()
+        try:
+            ts,d=self._stats_cache[thread.id]
+            if t-ts<self._ttl:return d
+        except KeyError:pass
+        try:
+            d=await get_thread_stats(thread)
+            stats=(d.get('reaction_count',0),d.get('reply_count',0))
+            self._stats_cache[thread.id]=(t,stats);self._stats_cache.move_to_end(thread.id)
+            if len(self._stats_cache)>self._max:self._stats_cache.popitem(last=False)
+            return stats
+        except Exception as e:logger.error(f"[boundary:error] Stats fetch: {e}");return 0,0
+    def store(self,tid,data,at=None):
+        self._cache[tid]=(time.monotonic(),data,at);self._cache.move_to_end(tid)
+        if len(self._cache)>self._max:self._cache.popitem(last=False)
+    def get(self,tid,at=None):
+        try:ts,d,eat=self._cache[tid]
+        except KeyError:return None
+        if at and eat and at!=eat:return None
+        return d if time.monotonic()-ts<self._ttl or(at and at==eat and d.ia and len(self._cache)<self._max) else None
+    def cleanup(self):
+        t=time.monotonic()
         if t-self._last_cleanup<60:return 0
-        self._last_cleanup=t;expt=[k for k,v in self._cache.items() if t-v['timestamp']>self._ttl];exps=[k for k,v in self._stats_cache.items() if t-v['timestamp']>self._ttl]
-        for k in expt:del self._cache[k]
-        for k in exps:del self._stats_cache[k]
-        c=len(expt)+len(exps);logger.debug(f"[signal] Cleaned {c} cache entries") if c>0 else None;return c
+        self._last_cleanup,c=t,0
+        for a in('_cache','_stats_cache') if len(self._cache)>=self._max else('_stats_cache',):
+            d,k=getattr(self,a),0
+            for v in d.values():
+                if t-v[0]<=self._ttl:break
+                k+=1
+            if k>len(d)//4:setattr(self,a,OrderedDict(islice(d.items(),k,None)))
+            else:
+                for _ in range(k):d.popitem(last=False)
+            c+=k
+        logger.debug(f"[signal] Cleaned {c} cache entries") if c>0 else None;return c
+
+_MISS=object()
+def _retry_delay(e,rc):
+    # HTTPException carries no retry_after; a 429 that reaches us still has Discord's wait in its headers
+    if e.status==429:
+        try:return min(float(e.response.headers.get('Retry-After')),10.0)
+        except(AttributeError,TypeError,ValueError):pass
+    return min(2.0**rc,10.0)
+_DATE_FMTS=("%Y-%m-%d","%Y/%m/%d","%m/%d/%Y","%d.%m.%Y","%b %d %Y","%d %b %Y","%B %d %Y","%d %B %Y")
+_REL_DT=re.compile(r"^(\d+)([dwmy])$")
+
+_ca,_rp,_rx,_la,_tl=(operator.attrgetter(k) for k in('ca','rp','rx','la','tl'))
+_SORT_KEYS={
+    "newest":(_ca,True),"oldest":(_ca,False),"most_replies":(_rp,True),"least_replies":(_rp,False),
+    "most_reactions":(_rx,True),"least_reactions":(_rx,False),"alphabetical":(_tl,False),"reverse_alphabetical":(_tl,True),
+    "last_active_new":(_la,True),"last_active_old":(_la,False)
+}
+
+@lru_cache(maxsize=128)
+def _parse_dt_on(ds,d):
+    if len(ds)==10 and ds[4]==ds[7]=="-" and ds[:4].isdigit() and ds[5:7].isdigit() and ds[8:].isdigit():
+        try:return datetime(int(ds[:4]),int(ds[5:7]),int(ds[8:]),tzinfo=timezone.utc)
+        except ValueError:return None
+    for fmt in _DATE_FMTS:
+        try:return datetime.strptime(ds,fmt).replace(tzinfo=timezone.utc)
+        except ValueError:continue
+    # Thread timestamps are UTC-aware, so every parsed bound is a UTC midnight
+    n=datetime(d.year,d.month,d.day,tzinfo=timezone.utc)
+    if ds=="today":return n
+    if ds=="yesterday":return n-timedelta(days=1)
+    if not(rm:=_REL_DT.match(ds)):return None
+    v,u=int(rm.group(1)),rm.group(2)
+    if u=="m":
+        y,mo=n.year,n.month-v
+        while mo<=0:mo,y=mo+12,y-1
+        return datetime(y,mo,1,tzinfo=timezone.utc)
+    return n-timedelta(days=v*{"d":1,"w":7,"y":365}[u])
 
 class SearchOrder(str,enum.Enum):
     newest,oldest,most_replies,least_replies,most_reactions,least_reactions,alphabetical,reverse_alphabetical,last_active_new,last_active_old="newest","oldest","most_replies","least_replies","most_reactions","least_reactions","alphabetical","reverse_alphabetical","last_active_new","last_active_old"
@@ -40,16 +108,18 @@ class SearchOrder(str,enum.Enum):
 class CancelView(discord.ui.View):
     def __init__(self,cancel_event):super().__init__(timeout=300);self.ce=cancel_event
     @discord.ui.button(label="Cancel",style=discord.ButtonStyle.danger)
-    async def cancel_button(self,intr,btn):self.ce.set();[setattr(i,'disabled',True) for i in self.children];await intr.response.edit_message(view=self)
-    async def disable_buttons(self):[setattr(i,'disabled',True) for i in self.children]
+    async def cancel_button(self,intr,btn):self.ce.set();self._disable_all();await intr.response.edit_message(view=self)
+    def _disable_all(self):
+        for i in self.children:i.disabled=True
 
 class Search(commands.Cog,name="search"):
+    _qp=SearchQueryParser()
     def __init__(self,bot):
         self.bot,self.ebd,self.atp=bot,DiscordEmbedBuilder(EMBED_COLOR),AttachmentProcessor()
-        self._tc,self._asc,self._sh,self._fh,self._th=ThreadCache(ttl=300),{},{},{},{}
-        self._qp,self._ssem=SearchQueryParser(),asyncio.Semaphore(CONCURRENT_SEARCH_LIMIT)
-        self._url_pat,self._date_fmts=re.compile(r'https?://\S+'),["%Y-%m-%d","%Y/%m/%d","%m/%d/%Y","%d.%m.%Y","%b %d %Y","%d %b %Y","%B %d %Y","%d %B %Y"]
-        self._cct=bot.loop.create_task(self._cln_cache_task());self._sct=bot.loop.create_task(self._cln_search_task())
+        self._tc,self._asc,self._sh,self._fh,self._th=ThreadCache(ttl=THREAD_CACHE_TTL,maxsize=THREAD_CACHE_SIZE),weakref.WeakValueDictionary(),{},{},{}
+        self._fc,self._tgc,self._acc={},{},OrderedDict()
+        self._gsem,self._gds=asyncio.Semaphore(MAX_CONCURRENT_SEARCHES),weakref.WeakValueDictionary()
+        self._cct=bot.loop.call_later(60,self._cln_cache)
         self.cfg,self.cache,self.stats=bot.config.get('search',{}),bot.cache,None
         self.max_hist=self.cfg.get('history_size',20);logger.info("[init] Search cog")
     
@@ -59,130 +129,150 @@ class Search(commands.Cog,name="search"):
         if isinstance(err,app_commands.CommandOnCooldown):await intr.response.send_message(f"⏳ CD {err.retry_after:.1f}s",ephemeral=True)
         elif isinstance(err,app_commands.CheckFailure):await intr.response.send_message("⚠️ No perm.",ephemeral=True)
         else:logger.error(f"[boundary:error] Cmd err: {err}",exc_info=err);await intr.response.send_message("⚠️ Error.",ephemeral=True) if not intr.response.is_done() else None
-    async def cog_unload(self):self._cct.cancel() if self._cct else None;self._sct.cancel() if self._sct else None
+    @commands.Cog.listener()
+    async def on_guild_channel_update(self,before,after):self._fc.pop(after.guild.id,None);self._tgc.pop(after.id,None);self._acc.clear()
+    @commands.Cog.listener()
+    async def on_guild_channel_create(self,ch):self._fc.pop(ch.guild.id,None)
+    @commands.Cog.listener()
+    async def on_guild_channel_delete(self,ch):self._fc.pop(ch.guild.id,None);self._tgc.pop(ch.id,None);self._acc.clear()
+    async def cog_unload(self):
+        self._cct.cancel() if self._cct else None
+        for t in list(self._asc.values()):t.cancel()
     
-    async def _cln_cache_task(self):
-        while not self.bot.is_closed():
-            try:await self._tc.cleanup()
-            except Exception as e:logger.error(f"[boundary:error] Cache cleanup: {e}")
-            await asyncio.sleep(60)
-    async def _cln_search_task(self):
-        while not self.bot.is_closed():
-            try:
-                n,exp=datetime.now(),[s for s,i in self._asc.items() if (n-i["start_time"]).total_seconds()>600]
-                if exp:[self._asc.pop(s,None) for s in exp];logger.debug(f"[signal] Removed {len(exp)} expired searches")
-            except Exception as e:logger.error(f"[boundary:error] Search cleanup: {e}")
-            await asyncio.sleep(300)
-
-    @lru_cache(maxsize=256)
-    def _chk_tags(self,tt,st,et):tl={t.lower() for t in tt};return (not st or any(t in tl for t in st))and(not et or not any(t in tl for t in et))
+    def _cln_cache(self):
+        try:self._tc.cleanup()
+        except Exception as e:logger.error(f"[boundary:error] Cache cleanup: {e}")
+        if not self.bot.is_closed():self._cct=self.bot.loop.call_later(60,self._cln_cache)
     def _prep_kws(self,kws):return[k.strip().lower() for k in kws if k and k.strip()]
-    def _chk_kws(self,c,sq,ek):
-        if not c:return not sq
-        cl=c.lower()
-        if ek and any(k in cl for k in ek):return False
-        if not sq:return True
-        t=self._qp.parse_query(sq)
-        return all(k in cl for k in t["keywords"]) if t["type"]=="simple" else self._qp.evaluate(t["tree"],c) if t["type"]=="advanced" else True
+    def _chk_kws(self,td,cond):
+        if not(c:=td.c):return not cond.get('sq')
+        if t:=cond.get('pq'):
+            if t["type"]=="simple":
+                if(ik:=cond.get('ik_re'))and not ik.match(c):return False
+            elif t["type"]=="advanced":
+                if(cl:=td.cl)is None:cl=td.cl=c.lower()
+                if not self._qp.evaluate(t["tree"],c,cl):return False
+        return not((ek:=cond.get('ek_re'))and ek.search(c))
 
-    async def _proc_th(self,th,cond,ce=None,rc=0,fcs=None):
-        if not th or not th.id or(ce and ce.is_set()):return None
-        async with self._ssem:
-            if(cond.get('sd')and th.created_at<cond['sd'])or(cond.get('ed')and th.created_at>cond['ed']):return None
-            o=getattr(th,'owner',None)
-            if(cond.get('op')and(not o or o.id!=cond['op'].id))or(cond.get('ex_op')and o and o.id==cond['ex_op'].id):return None
-            tt=tuple(t.name for t in getattr(th,'applied_tags',[]))
-            st,et=tuple(cond.get('stags',[])),tuple(cond.get('etags',[]))
-            if not self._chk_tags(tt,st,et):return None
-            ct=self._tc.get(th.id)
-            if ct and self._chk_kws(ct.get('c',''),cond.get('sq',''),cond.get('ek',[])):return ct
-            if ct:return None
-            try:
-                td={'t':th,'tid':th.id,'ttl':th.name,'a':o,'ca':th.created_at,'ia':th.archived,'tags':tt,
-                   's':await self._tc.get_thread_stats(th),'url':th.jump_url}
-                cn,msg_id,m="",None,None
-                try:
-                    async for msg in th.history(limit=fcs or 1,oldest_first=True):cn,m,msg_id=msg.content,msg,msg.id;fcs=None if not m else fcs;break
+    def _mk_chks(self,cond):
+        c=[]
+        if sd:=cond.get('sd'):c.append(lambda t:t.created_at>=sd)
+        if ed:=cond.get('ed'):c.append(lambda t:t.created_at<=ed)
+        if op:=cond.get('op'):c.append(lambda t,i=op.id:getattr(t,'owner_id',None)==i)
+        if ex:=cond.get('ex_op'):c.append(lambda t,i=ex.id:getattr(t,'owner_id',None)!=i)
+        if mp:=cond.get('mp'):c.append(lambda t:(n:=getattr(t,'message_count',None))is None or n-1>=mp)
+        if cond.get('stags'):c.append(lambda t,s=cond['stid']:not s.isdisjoint(x.id for x in getattr(t,'applied_tags',[])))
+        if cond.get('etid'):c.append(lambda t,s=cond['etid']:s.isdisjoint(x.id for x in getattr(t,'applied_tags',[])))
+        return c
+    def _pre_chk(self,th,cond):return all(c(th) for c in cond['chk'])
+
+    def _post_chk(self,td,cond):
+        if(cond.get('mr')and td.rx<cond['mr'])or(cond.get('mp')and td.rp<cond['mp']):return False
+        return self._chk_kws(td,cond)
+
+    def _fast_th(self,th,cond):
+        if not th or not th.id or not self._pre_chk(th,cond):return None
+        if not(ct:=self._tc.get(th.id,getattr(th,'archive_timestamp',None))):return _MISS
+        return ct if self._post_chk(ct,cond) else None
+
+    async def _proc_th(self,th,cond,ce=None,rc=0):
+        if ce and ce.is_set():return None
+        try:
+            if not(m:=getattr(th,'starter_message',None)):
+                try:m=await th.fetch_message(th.id)
+                except discord.NotFound:m=None
                 except discord.HTTPException as e:
-                    if e.status==429 and rc<3:await asyncio.sleep(e.retry_after or(1*(rc+1)));return await self._proc_th(th,cond,ce,rc+1,fcs)
-                    elif 500<=e.status<600 and rc<3:await asyncio.sleep(1*(rc+1));return await self._proc_th(th,cond,ce,rc+1,fcs)
-                    else:raise
-                td['c'],td['fm'],td['fmid'],td['la']=cn,m,msg_id,getattr(getattr(th,'last_message',None),'created_at',th.created_at)
-                if not self._chk_kws(cn,cond.get('sq',''),cond.get('ek',[])):return None
-                if(cond.get('mr')and td['s'].get('reaction_count',0)<cond['mr'])or(cond.get('mp')and td['s'].get('reply_count',0)<cond['mp']):return None
-                self._tc.store(th.id,td);return td
-            except Exception as e:logger.error(f"[boundary:error] Thread process: {e}",exc_info=True);return None
+                    if(e.status==429 or 500<=e.status<600)and rc<3:await asyncio.sleep(_retry_delay(e,rc));return await self._proc_th(th,cond,ce,rc+1)
+                    raise
+            if(n:=getattr(th,'message_count',None))is not None:s=(sum(r.count for r in m.reactions) if m else 0,max(0,n-1))
+            else:s=await self._tc.get_thread_stats(th)
+            td=ThreadRecord(th,s,m)
+            self._tc.store(th.id,td,getattr(th,'archive_timestamp',None))
+            return td if self._post_chk(td,cond) else None
+        except Exception as e:logger.error(f"[boundary:error] Thread process: {e}",exc_info=True);return None
 
-    async def _proc_th_batch(self,ths,cond,ce=None):
-        if not ths or(ce and ce.is_set()):return[]
-        tasks=[self._proc_th(t,cond,ce,fcs=10) for t in ths]
-        res=await asyncio.gather(*tasks,return_exceptions=True)
-        return[r for r in res if r and not isinstance(r,Exception)]
+    def _mk_ctx(self,frm,cond):
+        # Derived matching state lives in a per-search copy so the caller's conditions stay user-facing
+        sq,ek=cond.get('sq'),cond.get('ek')or()
+        pq=self._qp.parse_query(sq) if sq else None
+        cx={**cond,'pq':pq,'ik_re':compile_all_keywords(pq["keywords"]) if pq and pq["type"]=="simple" else None,'ek_re':compile_keywords(ek)}
+        tl={}
+        for t in getattr(frm,'available_tags',[]):tl.setdefault(t.name.lower(),set()).add(t.id)
+        cx['stid'],cx['etid']=(frozenset(i for n in cond.get(k)or() for i in tl.get(n,())) for k in('stags','etags'))
+        cx['chk']=self._mk_chks(cx);return cx
 
-    async def _search_ths(self,frm,cond,ce,bs=50,pm=None):
-        res,pc,st,lu=[],0,datetime.now(),datetime.now()-timedelta(seconds=2)
-        at=await frm.active_threads()
-        if at and not ce.is_set():
-            pc+=len(at);pm and(datetime.now()-lu).total_seconds()>=1.5 and await pm.edit(embed=self.ebd.create_info_embed("Searching...",f"In {frm.mention}...\nActive: {pc} threads\nFound: 0\nTime: {(datetime.now()-st).total_seconds():.1f}s"));lu=datetime.now()
-            res.extend(await self._proc_th_batch(at,cond,ce))
-        if not ce.is_set():
-            try:
-                arct,bc=[],0
-                async for t in frm.archived_threads():
-                    if ce.is_set():break
-                    arct.append(t)
-                    if len(arct)>=bs:
-                        pc+=len(arct);bc+=1
-                        pm and(datetime.now()-lu).total_seconds()>=1.5 and await pm.edit(embed=self.ebd.create_info_embed("Searching...",f"In {frm.mention}...\nProcessed: {pc} threads\nFound: {len(res)}\nBatches: {bc}\nTime: {(datetime.now()-st).total_seconds():.1f}s"));lu=datetime.now()
-                        res.extend(await self._proc_th_batch(arct,cond,ce));arct=[]
-                if arct and not ce.is_set():
-                    pc+=len(arct);bc+=1
-                    pm and(datetime.now()-lu).total_seconds()>=1.5 and await pm.edit(embed=self.ebd.create_info_embed("Searching...",f"In {frm.mention}...\nProcessed: {pc} threads\nFound: {len(res)}\nBatches: {bc}\nTime: {(datetime.now()-st).total_seconds():.1f}s"));lu=datetime.now()
-                    res.extend(await self._proc_th_batch(arct,cond,ce))
-            except Exception as e:logger.error(f"[boundary:error] Archive search: {e}")
-        pm and(datetime.now()-lu).total_seconds()>=0.5 and await pm.edit(embed=self.ebd.create_info_embed("Processing...",f"Sorting {len(res)} results...\nTime: {(datetime.now()-st).total_seconds():.1f}s"));lu=datetime.now()
-        return[] if ce.is_set() else self._sort_res(res,cond.get('order','newest'))
+    async def _search_ths(self,frm,cond,ce,bs=50,nw=CONCURRENT_SEARCH_LIMIT,pm=None):
+        cond=self._mk_ctx(frm,cond)
+        res,ps,st,dv=[],{'pc':0,'lu':0.0,'pt':False},time.monotonic(),asyncio.Event()
+        # Archives page newest-archived first and a post is never archived before it was created, so once the
+        # archive time drops below the cap-th newest match nothing further can reach the first pages
+        cap,top=(MESSAGES_PER_PAGE*EARLY_STOP_PAGES if cond.get('order','newest')=='newest' else 0),[]
+        pe,hd,(sk,rv)=self.ebd.create_info_embed("Searching...",""),f"In {frm.mention}...\n",self._skey(cond.get('order','newest'))
+        async def _prog():
+            while True:
+                await dv.wait()
+                if(w:=ps['lu']+1.5-time.monotonic())>0:await asyncio.sleep(w)
+                dv.clear();ps['lu']=time.monotonic()
+                pe.description=f"{hd}Processed: {ps['pc']} threads\nFound: {len(res)}\nTime: {time.monotonic()-st:.1f}s"
+                try:
+                    if len(res)>=MESSAGES_PER_PAGE:
+                        pv=(heapq.nlargest if rv else heapq.nsmallest)(MESSAGES_PER_PAGE,res,key=sk);ft=self._ftr(len(res),0)
+                        await pm.edit(embeds=[pe,*[self._gen_res_ebd(i,ft) for i in pv]])
+                    else:await pm.edit(embed=pe)
+                except discord.HTTPException as e:logger.warning(f"[boundary:error] Progress update: {e}")
+        pt=asyncio.create_task(_prog()) if pm else None
+        try:
+            if not ce.is_set():
+                q=asyncio.Queue(maxsize=bs*2)
+                async def _act():
+                    try:
+                        for t in await frm.active_threads()or():
+                            if ce.is_set():break
+                            await q.put(t)
+                    except Exception as e:logger.error(f"[boundary:error] Active search: {e}")
+                async def _arc():
+                    try:
+                        async for t in frm.archived_threads():
+                            if ce.is_set():break
+                            if cap and len(top)>=cap and(at:=t.archive_timestamp)and at<top[0]:ps['pt']=True;break
+                            await q.put(t)
+                    except Exception as e:logger.error(f"[boundary:error] Archive search: {e}")
+                async def _feed():
+                    # Producers swallow their own errors, so this only raises on cancellation, when the workers are
+                    # cancelled too and a put on the full queue would block forever
+                    await asyncio.gather(_act(),_arc())
+                    for _ in range(nw):await q.put(None)
+                async def _work():
+                    while(t:=await q.get())is not None:
+                        if ce.is_set():continue
+                        try:
+                            if(r:=self._fast_th(t,cond))is _MISS:r=await self._proc_th(t,cond,ce)
+                            if r:
+                                res.append(r)
+                                if cap:(heapq.heappush if len(top)<cap else heapq.heappushpop)(top,r.ca)
+                            ps['pc']+=1;dv.set()
+                        except Exception as e:logger.error(f"[boundary:error] Search worker: {e}")
+                # Take the guild slot first so a busy guild queues on its own limit without holding global slots;
+                # the entry is weak, so a guild's semaphore goes away once no search holds or waits on it
+                gs=self._gds.setdefault(frm.guild.id,asyncio.Semaphore(GUILD_CONCURRENT_SEARCHES))
+                async with gs,self._gsem:await asyncio.gather(_feed(),*[_work() for _ in range(nw)])
+        finally:pt and pt.cancel()
+        if pm and time.monotonic()-ps['lu']>=0.5:await pm.edit(embed=self.ebd.create_info_embed("Processing...",f"Sorting {len(res)} results...\nTime: {time.monotonic()-st:.1f}s"))
+        return([],False) if ce.is_set() else(self._sort_res(res,cond.get('order','newest')),ps['pt'])
 
+    def _skey(self,order):return _SORT_KEYS.get(order,_SORT_KEYS["newest"])
     def _sort_res(self,ths,order):
         if not ths:return[]
-        sk,rv=None,False
-        so={
-            "newest":(lambda t:t['ca'],True),"oldest":(lambda t:t['ca'],False),
-            "most_replies":(lambda t:t['s'].get('reply_count',0),True),"least_replies":(lambda t:t['s'].get('reply_count',0),False),
-            "most_reactions":(lambda t:t['s'].get('reaction_count',0),True),"least_reactions":(lambda t:t['s'].get('reaction_count',0),False),
-            "alphabetical":(lambda t:t['ttl'].lower(),False),"reverse_alphabetical":(lambda t:t['ttl'].lower(),True),
-            "last_active_new":(lambda t:t.get('la',t['ca']),True),"last_active_old":(lambda t:t.get('la',t['ca']),False)
-        }
-        sk,rv=so.get(order,(lambda t:t['ca'],True))
-        ths.sort(key=sk,reverse=rv) if sk else None;return ths
+        sk,rv=self._skey(order);ths.sort(key=sk,reverse=rv);return ths
 
-    def _parse_dt(self,ds):
-        if not ds:return None
-        ds,n=ds.strip().lower(),datetime.now()
-        try:
-            for fmt in self._date_fmts:
-                try:return datetime.strptime(ds,fmt)
-                except ValueError:continue
-        except Exception:pass
-        if ds=="today":return n.replace(hour=0,min=0,sec=0,micro=0)
-        if ds=="yesterday":return(n-timedelta(days=1)).replace(hour=0,min=0,sec=0,micro=0)
-        if dm:=re.match(r"^(\d+)d$",ds):return(n-timedelta(days=int(dm.group(1)))).replace(hour=0,min=0,sec=0,micro=0)
-        if wm:=re.match(r"^(\d+)w$",ds):return(n-timedelta(weeks=int(wm.group(1)))).replace(hour=0,min=0,sec=0,micro=0)
-        if mm:=re.match(r"^(\d+)m$",ds):
-            m=int(mm.group(1));y,mo=n.year,n.month-m
-            while mo<=0:mo,y=mo+12,y-1
-            return datetime(y,mo,1)
-        if ym:=re.match(r"^(\d+)y$",ds):return(n-timedelta(days=int(ym.group(1))*365)).replace(hour=0,min=0,sec=0,micro=0)
-        return None
+    def _parse_dt(self,ds):return _parse_dt_on(ds.strip().lower(),datetime.now(timezone.utc).date()) if ds else None
 
     def _store_sh(self,uid,sw=None,fid=None,conds=None,rc=0,pc=0,et=0):
-        if uid not in self._sh:self._sh[uid]=[]
-        e={'ts':datetime.now(),'sw':sw,'conds':conds,'rc':rc,'pc':pc,'et':et};e['fid']=fid if fid is not None else None
-        self._sh[uid].insert(0,e);self._sh[uid]=self._sh[uid][:self.max_hist]
+        if uid not in self._sh:self._sh[uid]=deque(maxlen=self.max_hist)
+        e={'ts':datetime.now(),'sw':sw,'conds':{k:conds[k] for k in('stags','sq','op') if conds.get(k)} if conds else None,'rc':rc,'pc':pc,'et':et};e['fid']=fid if fid is not None else None
+        self._sh[uid].appendleft(e)
         if fid:self._fh[uid]=fid
-        if sw and conds and conds.get('stags'):
-            for t in conds['stags']:
-                self._th[uid]=self._th.get(uid,{});self._th[uid][t]=self._th[uid].get(t,0)+1
+        if sw and conds and conds.get('stags'):self._th.setdefault(uid,Counter()).update(conds['stags']);self._acc.clear()
         try:self._save_hist()
         except:pass
 
@@ -198,9 +288,9 @@ class Search(commands.Cog,name="search"):
         try:
             with open("data/search_history.json","r") as f:
                 d=json.load(f)
-                self._sh={int(uid):[{**s,"ts":datetime.fromisoformat(s['ts'])} for s in hist] for uid,hist in d.get("hist",{}).items()}
+                self._sh={int(uid):deque(({**s,"ts":datetime.fromisoformat(s['ts'])} for s in hist),maxlen=self.max_hist) for uid,hist in d.get("hist",{}).items()}
                 self._fh={int(uid):fid for uid,fid in d.get("forum",{}).items()}
-                self._th={int(uid):{t:c for t,c in tags.items()} for uid,tags in d.get("tags",{}).items()}
+                self._th={int(uid):Counter(tags) for uid,tags in d.get("tags",{}).items()}
         except Exception as e:logger.error(f"[boundary:error] Load history: {e}")
 
     async def _build_conds(self,intr,**kw):
@@ -211,33 +301,15 @@ class Search(commands.Cog,name="search"):
             if e:=kw.get('end_date'):
                 if not(ed:=self._parse_dt(e)):raise ValueError(f"Bad end date: {e}")
                 if ed:ed+=timedelta(days=1,microseconds=-1)
-            stags,etags=set(),set()
-            for i in range(1,4):
-                if t:=kw.get(f'tag{i}'):
-                    stags.add(t.lower())
-            for i in range(1,3):
-                if t:=kw.get(f'exclude_tag{i}'):
-                    etags.add(t.lower())
-            return{'stags':stags,'etags':etags,'sq':kw.get('search_word'),'ek':self._prep_kws(kw.get('exclude_word',"").split(",")),
+            stags=frozenset(t.lower() for i in range(1,4) if(t:=kw.get(f'tag{i}')))
+            etags=frozenset(t.lower() for i in range(1,3) if(t:=kw.get(f'exclude_tag{i}')))
+            ek,sq=tuple(self._prep_kws((kw.get('exclude_word')or"").split(","))),kw.get('search_word')
+            return{'stags':stags,'etags':etags,'sq':sq,'ek':ek,
                   'op':kw.get('original_poster'),'ex_op':kw.get('exclude_op'),'sd':sd,'ed':ed,
                   'mr':kw.get('min_reactions'),'mp':kw.get('min_replies'),'order':kw.get('order')}
         except ValueError as e:await intr.followup.send(embed=self.ebd.create_error_embed("Date Error",str(e)),ephemeral=True);return None
 
-    async def _gen_res_ebd(self,item,tr,pn):
-        t,s=item['t'],item['s']
-        e=discord.Embed(title=truncate_text(t.name,256),url=item['url'],color=EMBED_COLOR)
-        if o:=item['a']:e.set_author(name=o.display_name,icon_url=o.display_avatar.url)
-        if m:=item.get('fm'):e.description=f"**Sum:**\n{truncate_text(m.content.strip(),1000)}";(e.set_thumbnail(url=th) if(th:=self.atp.get_first_image(m))else None)
-        if tags:=item['tags']:e.add_field(name="Tags",value=", ".join(tags),inline=True)
-        e.add_field(name="Stats",value=f"👍 {s.get('reaction_count',0)} | 💬 {s.get('reply_count',0)}",inline=True)
-        la=item.get('la',t.created_at)
-        e.add_field(name="Time",value=f"Cr: {discord.utils.format_dt(t.created_at,'R')}\nAct: {discord.utils.format_dt(la,'R')}",inline=True)
-        st,en=pn*MESSAGES_PER_PAGE+1,min((pn+1)*MESSAGES_PER_PAGE,tr)
-        e.set_footer(text=f"Res {st}-{en} of {tr}");return e
-
-    async def _pres_res(self,intr,frm,res,cond,pm,ov):
-        if not res:await pm.edit(embed=self.ebd.create_info_embed("No Results",f"No matches in {frm.mention}."),view=None);return
-        s=discord.Embed(title=f"Results: {frm.name}",description=f"{len(res)} found",color=EMBED_COLOR)
+    def _crit(self,cond):
         c=[]
         if cond.get('stags'):c.append(f"🏷️: {', '.join(cond['stags'])}")
         if cond.get('etags'):c.append(f"🚫🏷️: {', '.join(cond['etags'])}")
@@ -249,58 +321,77 @@ class Search(commands.Cog,name="search"):
         if ed:=cond.get('ed'):c.append(f"📅<: {(ed-timedelta(microseconds=1)).strftime('%y-%m-%d')}")
         if mr:=cond.get('mr'):c.append(f"👍≥: {mr}")
         if mp:=cond.get('mp'):c.append(f"💬≥: {mp}")
-        if c:s.add_field(name="Criteria",value=" | ".join(c),inline=False)
-        embs=await asyncio.gather(*[self._gen_res_ebd(r,len(res),0) for r in res[:MESSAGES_PER_PAGE]])
-        pag=MultiEmbedPaginationView(items=res,items_per_page=MESSAGES_PER_PAGE,
-            generate_embeds=lambda items,page:asyncio.gather(*[self._gen_res_ebd(i,len(res),page) for i in items]))
+        return" | ".join(c)
+
+    def _ftr(self,tr,pn):return f"Res {pn*MESSAGES_PER_PAGE+1}-{min((pn+1)*MESSAGES_PER_PAGE,tr)} of {tr}"
+    def _gen_res_ebd(self,item,ft):
+        e=discord.Embed(title=truncate_text(item.ttl,256),url=item.url,color=EMBED_COLOR)
+        if o:=item.a:e.set_author(name=o.display_name,icon_url=o.display_avatar.url)
+        if m:=item.fm or item.t.starter_message:e.description=f"**Sum:**\n{truncate_text(m.content.strip(),1000)}";(e.set_thumbnail(url=th) if(th:=self.atp.get_first_image(m))else None)
+        if tags:=item.tags:e.add_field(name="Tags",value=", ".join(tags),inline=True)
+        e.add_field(name="Stats",value=f"👍 {item.rx} | 💬 {item.rp}",inline=True)
+        e.add_field(name="Time",value=f"Cr: {discord.utils.format_dt(item.ca,'R')}\nAct: {discord.utils.format_dt(item.la,'R')}",inline=True)
+        e.set_footer(text=ft);return e
+
+    async def _pres_res(self,intr,frm,res,cond,pm,ov,pt=False):
+        if not res:await pm.edit(embed=self.ebd.create_info_embed("No Results",f"No matches in {frm.mention}."),view=None);return
+        s=discord.Embed(title=f"Results: {frm.name}",description=f"{len(res)}{'+'*pt} found",color=EMBED_COLOR)
+        if c:=self._crit(cond):s.add_field(name="Criteria",value=c,inline=False)
+        pc={}
+        async def _page(items,page):
+            if page not in pc:ft=self._ftr(len(res),page);pc[page]=[self._gen_res_ebd(i,ft) for i in items]
+            return pc[page]
+        embs=await _page(res[:MESSAGES_PER_PAGE],0)
+        pag=MultiEmbedPaginationView(items=res,items_per_page=MESSAGES_PER_PAGE,generate_embeds=_page)
         await pm.edit(embed=s,view=None);await pag.start(intr,embs)
 
     @app_commands.command(name="forum_search",description="Search forum posts")
     @app_commands.describe(forum="Forum",order="Order",op="OP",ex_op="Exclude OP",tag1="Tag1",tag2="Tag2",tag3="Tag3",
                           ex_tag1="ExTag1",ex_tag2="ExTag2",sw="Keywords",ex_w="Exclude KW",sd="Start Date",ed="End Date",mr="Min Reacts",mp="Min Replies")
     @app_commands.choices(order=[app_commands.Choice(name=o,value=o) for o in["newest","oldest","most_replies","least_replies","most_reactions","least_reactions","alphabetical","reverse_alphabetical","last_active_new","last_active_old"]])
-    async def forum_search(self,intr,forum:discord.ForumChannel,order:Optional[str]="newest",op:Optional[discord.Member]=None,ex_op:Optional[discord.Member]=None,
+    async def forum_search(self,intr,forum:str,order:Optional[str]="newest",op:Optional[discord.Member]=None,ex_op:Optional[discord.Member]=None,
                            tag1:Optional[str]=None,tag2:Optional[str]=None,tag3:Optional[str]=None,ex_tag1:Optional[str]=None,ex_tag2:Optional[str]=None,
                            sw:Optional[str]=None,ex_w:Optional[str]=None,sd:Optional[str]=None,ed:Optional[str]=None,mr:Optional[int]=None,mp:Optional[int]=None):
         if not intr.guild:await intr.response.send_message("Server only",ephemeral=True);return
+        if not(forum:=self._res_forum(intr.guild,forum)):await intr.response.send_message("Unknown forum",ephemeral=True);return
         p=forum.permissions_for(intr.guild.me)
         if not(p.read_messages and p.send_messages and p.embed_links):await intr.response.send_message(f"Need RSE perms in {forum.mention}",ephemeral=True);return
         if not any([op,tag1,tag2,tag3,sw,sd,ed]):await intr.response.send_message("Need criteria",ephemeral=True);return
-        sid=str(uuid.uuid4());ce=asyncio.Event();self._asc[sid]={"cancel_event":ce,"start_time":datetime.now()}
+        sid=str(uuid.uuid4());ce=asyncio.Event()
         await intr.response.defer(thinking=True)
         conds=await self._build_conds(intr,original_poster=op,exclude_op=ex_op,tag1=tag1,tag2=tag2,tag3=tag3,exclude_tag1=ex_tag1,exclude_tag2=ex_tag2,
                                      search_word=sw,exclude_word=ex_w,start_date=sd,end_date=ed,min_reactions=mr,min_replies=mp,order=order)
         if not conds:return
-        c=[]
-        if conds.get('stags'):c.append(f"🏷️: {', '.join(conds['stags'])}")
-        if conds.get('etags'):c.append(f"🚫🏷️: {', '.join(conds['etags'])}")
-        if conds.get('sq'):c.append(f"🔍: {conds['sq']}")
-        if conds.get('ek'):c.append(f"❌: {', '.join(conds['ek'])}")
-        if op:=conds.get('op'):c.append(f"👤: {op.display_name}")
-        if ex:=conds.get('ex_op'):c.append(f"🚷: {ex.display_name}")
-        if sd:=conds.get('sd'):c.append(f"📅>: {sd.strftime('%y-%m-%d')}")
-        if ed:=conds.get('ed'):c.append(f"📅<: {(ed-timedelta(microseconds=1)).strftime('%y-%m-%d')}")
-        if mr:=conds.get('mr'):c.append(f"👍≥: {mr}")
-        if mp:=conds.get('mp'):c.append(f"💬≥: {mp}")
-        pm=await intr.followup.send(embed=self.ebd.create_info_embed("Searching...",f"In {forum.mention}...\n"+("**Criteria**\n{' | '.join(c)}" if c else"")),view=CancelView(ce))
-        st=asyncio.create_task(self._search_ths(forum,conds,ce,pm=pm));st.add_done_callback(lambda _:asyncio.create_task(CancelView(ce).disable_buttons()))
+        pm=await intr.followup.send(embed=self.ebd.create_info_embed("Searching...",f"In {forum.mention}...\n"+(f"**Criteria**\n{c}" if(c:=self._crit(conds))else"")),view=CancelView(ce))
+        st=asyncio.create_task(self._search_ths(forum,conds,ce,pm=pm),name=f"search:{intr.user.id}");self._asc[sid]=st
         try:
-            start=datetime.now();r=await st;et=(datetime.now()-start).total_seconds()
+            start=time.monotonic();r,pt=await st;et=time.monotonic()-start
             if ce.is_set():await pm.edit(embed=self.ebd.create_info_embed("Cancelled","Search cancelled"),view=None);return
             self._store_sh(intr.user.id,sw,forum.id,conds,len(r),sum(1 for _ in forum.threads),et)
-            self.stats and self.stats.log_search(intr.user.id,"forum",fid=forum.id,terms=sw,filters=json.dumps({k:str(v) for k,v in conds.items() if k not in('op','ex_op')}),results=len(r))
-            await self._pres_res(intr,forum,r,conds,pm,order)
+            self.stats and self.stats.log_search(intr.user.id,"forum",fid=forum.id,terms=sw,filters=json.dumps({k:sorted(v) if isinstance(v:=conds[k],(frozenset,tuple)) else str(v) for k in('stags','etags','sq','ek','sd','ed','mr','mp','order') if conds.get(k)}),results=len(r))
+            await self._pres_res(intr,forum,r,conds,pm,order,pt)
         except Exception as e:logger.exception(f"Search err: {e}");await pm.edit(embed=self.ebd.create_error_embed("Error",f"Err: {str(e)}"),view=None)
         finally:
-            if sid in self._asc:del self._asc[sid]
+            self._asc.pop(sid,None)
+
+    def _forums(self,g):
+        if(e:=self._fc.get(g.id))and time.monotonic()-e[0]<60:return e[1]
+        f=sorted(((ch,ch.name.lower()) for ch in g.channels if isinstance(ch,discord.ForumChannel)),key=operator.itemgetter(1));self._fc[g.id]=(time.monotonic(),f);return f
+    def _res_forum(self,g,v):
+        # Channel-typed options can't autocomplete, so the forum arrives as the suggested id or a typed name
+        if v.isdigit()and isinstance(ch:=g.get_channel(int(v)),discord.ForumChannel):return ch
+        n=v.strip().lstrip('#').lower();return next((ch for ch,cn in self._forums(g) if cn==n),None)
+    def _ftags(self,frm):
+        if(e:=self._tgc.get(frm.id))and time.monotonic()-e[0]<60:return e[1]
+        t=sorted(((tg,tg.name.lower()) for tg in frm.available_tags),key=operator.itemgetter(1));self._tgc[frm.id]=(time.monotonic(),t);return t
 
     @forum_search.autocomplete('forum')
     async def forum_ac(self,intr,cur):
         if not intr.guild:return[]
         uid=intr.user.id;rf=self._fh.get(uid)
-        frms=[ch for ch in intr.guild.channels if isinstance(ch,discord.ForumChannel)and(not cur or cur.lower() in ch.name.lower())]
-        res=sorted([(ch,10 if ch.id==rf else 0) for ch in frms],key=lambda x:(-x[1],x[0].name.lower()))
-        return[app_commands.Choice(name=f"#{ch.name}"+(" 🔄" if wt>0 else""),value=ch.id) for ch,wt in res[:25]]
+        cl=cur.lower() if cur else None
+        res=sorted([ch for ch,n in self._forums(intr.guild) if not cl or cl in n],key=lambda ch:ch.id!=rf)
+        return[app_commands.Choice(name=f"#{ch.name}"+(" 🔄" if ch.id==rf else""),value=str(ch.id)) for ch in res[:25]]
     
     @forum_search.autocomplete('tag1')
     @forum_search.autocomplete('tag2')
@@ -309,15 +400,19 @@ class Search(commands.Cog,name="search"):
     @forum_search.autocomplete('ex_tag2')
     async def tag_ac(self,intr,cur):
         if not intr.guild:return[]
-        fid=None;[fid:=opt["value"] for opt in intr.data.get("options",[]) if opt["name"]=="forum" and"value" in opt]
-        if not fid:return[]
-        frm=intr.guild.get_channel(int(fid))
-        if not isinstance(frm,discord.ForumChannel):return[]
-        stags=set();[stags.add(opt["value"].lower()) for opt in intr.data.get("options",[]) if opt["name"].startswith(("tag","ex_tag"))and"value" in opt]
-        uid=intr.user.id;th=self._th.get(uid,{})
-        atags=[(t,th.get(t.name.lower(),0)) for t in frm.available_tags if t.name.lower() not in stags and(not cur or cur.lower() in t.name.lower())and(not t.moderated or intr.user.guild_permissions.manage_threads)]
-        res=sorted(atags,key=lambda x:(-x[1],x[0].name.lower()))
-        return[app_commands.Choice(name=t.name+(" 🔄" if wt>0 else""),value=t.name) for t,wt in res[:25]]
+        opts={o["name"]:o["value"] for o in intr.data.get("options",[]) if"value" in o}
+        if not(fid:=opts.get("forum")):return[]
+        if not(frm:=self._res_forum(intr.guild,str(fid))):return[]
+        stags=frozenset(v.lower() for k,v in opts.items() if k.startswith(("tag","ex_tag"))and v)
+        uid,cl,cm=intr.user.id,cur.lower() if cur else None,intr.user.guild_permissions.manage_threads
+        # Discord fires on every keystroke and backspace, so repeated prefixes are served from a short-lived cache
+        if(e:=self._acc.get(k:=(frm.id,uid,cl,stags,cm)))and time.monotonic()-e[0]<15:return e[1]
+        th=self._th.get(uid,{})
+        # The index breaks frequency ties in the cached name order and keeps the compare on plain tuples
+        atags=((-th.get(n,0),i,t) for i,(t,n) in enumerate(self._ftags(frm)) if n not in stags and(not cl or cl in n)and(cm or not t.moderated))
+        r=self._acc[k]=(time.monotonic(),[app_commands.Choice(name=t.name+(" 🔄" if nw else""),value=t.name) for nw,_,t in heapq.nsmallest(25,atags)])
+        if len(self._acc)>512:self._acc.popitem(last=False)
+        return r[1]
     
     @forum_search.autocomplete('sd')
     @forum_search.autocomplete('ed')
@@ -345,7 +440,7 @@ class Search(commands.Cog,name="search"):
         h=self._sh.get(intr.user.id,[])
         if not h:await intr.response.send_message("No history",ephemeral=True);return
         e=discord.Embed(title="Recent Searches",description=f"{len(h)} found",color=EMBED_COLOR)
-        for i,s in enumerate(h[:10],1):
+        for i,s in enumerate(islice(h,10),1):
             ts,st,rc,pc,et=s.get('ts',datetime.now()),s.get('sw','N/A'),s.get('rc',0),s.get('pc',0),s.get('et',0)
             ft="? Forum";(ft:=f"#{f.name}") if(f:=intr.guild.get_channel(s.get('fid')))else None
             cd=[]
@@ -4,7 +4,6 @@ from discord import app_commands
 import psutil, asyncio, os, platform, logging
 from datetime import datetime
 from typing import Dict, Optional
-from concurrent.futures import ThreadPoolExecutor
 
 logger = logging.getLogger('discord_bot.stats')
 
@@ -187,8 +186,7 @@ class Stats(commands.Cog):
         while not self.bot.is_closed():
             try:
                 self._metrics['search']['last_hour'] = 0
-                with ThreadPoolExecutor(max_workers=1) as pool:
-                    await self.bot.loop.run_in_executor(pool, self._update_sys_metrics)
+                await self.bot.loop.run_in_executor(None, self._update_sys_metrics)
                 await asyncio.sleep(3600)  # hourly
             except asyncio.CancelledError:
                 break
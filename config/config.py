@@ -9,7 +9,12 @@ MAX_MESSAGES_PER_SEARCH = 1000  # Maximum number of messages per search
 MESSAGES_PER_PAGE = 5      # Number of messages displayed per page
 REACTION_TIMEOUT = 900.0   # Interaction button timeout (15 minutes)
 MAX_EMBED_FIELD_LENGTH = 1024  # Maximum length of Discord embed field
-CONCURRENT_SEARCH_LIMIT = 5  # Concurrent search limit
+CONCURRENT_SEARCH_LIMIT = 5  # Concurrent thread fetches per search
+MAX_CONCURRENT_SEARCHES = 3  # Searches scanning at once; further searches wait their turn
+GUILD_CONCURRENT_SEARCHES = 2  # Searches one guild may scan at once, so a busy guild can't take every slot
+THREAD_CACHE_TTL = 600  # Thread scan cache time, revalidated by archive timestamp (seconds)
+THREAD_CACHE_SIZE = 10000  # Soft cap; under it, archived threads outlive the TTL while their archive timestamp matches
+EARLY_STOP_PAGES = 10  # "Newest" searches stop reading archives once this many result pages are settled (0 = scan all)
 
 # Embed Configuration
 EMBED_COLOR = 0x3498db  # Discord Blue
@@ -0,0 +1,218 @@
+import asyncio
+import types
+from datetime import date, datetime, timedelta, timezone
+
+import discord
+
+import cogs.search as search_mod
+from cogs.search import Search, ThreadCache, _parse_dt_on, _retry_delay
+from config.config import EARLY_STOP_PAGES, MESSAGES_PER_PAGE
+
+
+def test_crit_with_every_filter():
+    cog = Search.__new__(Search)
+    cond = {
+        'stags': frozenset({'bug'}), 'etags': frozenset({'wontfix'}), 'sq': 'crash', 'ek': ('spam',),
+        'op': types.SimpleNamespace(display_name='alice'), 'ex_op': types.SimpleNamespace(display_name='bob'),
+        'sd': datetime(2024, 1, 1), 'ed': datetime(2024, 2, 1) + timedelta(days=1, microseconds=-1),
+        'mr': 3, 'mp': 2, 'order': 'newest',
+    }
+    crit = cog._crit(cond)
+    assert isinstance(crit, str)
+    for part in ("🏷️: bug", "🚫🏷️: wontfix", "🔍: crash", "❌: spam", "👤: alice", "🚷: bob",
+                 "📅>: 24-01-01", "📅<: 24-02-01", "👍≥: 3", "💬≥: 2"):
+        assert part in crit
+
+
+def test_crit_without_filters():
+    assert Search.__new__(Search)._crit({}) == ""
+
+
+def _chk(cog, **cond):
+    return {**cond, 'chk': cog._mk_chks(cond)}
+
+
+def test_parsed_dates_filter_aware_thread_times():
+    cog = Search.__new__(Search)
+    thread = types.SimpleNamespace(created_at=datetime(2024, 1, 5, 12, tzinfo=timezone.utc))
+    for ds in ("2024-01-01", "01/01/2024", "today", "7d", "1y"):
+        assert cog._parse_dt(ds).tzinfo is not None
+    assert cog._pre_chk(thread, _chk(cog, sd=cog._parse_dt("2024-01-01")))
+    assert not cog._pre_chk(thread, _chk(cog, sd=cog._parse_dt("2024-01-06")))
+    assert cog._pre_chk(thread, _chk(cog, ed=cog._parse_dt("2024-01-05") + timedelta(days=1, microseconds=-1)))
+    assert not cog._pre_chk(thread, _chk(cog, ed=cog._parse_dt("2024/01/04")))
+
+
+class _Msg:
+    def __init__(self, mid, content):
+        self.id, self.content, self.reactions, self.attachments = mid, content, [], []
+
+
+class _Thread:
+    def __init__(self, tid, content="body", days=0, delay=0.0):
+        self.id, self.name, self.jump_url, self.applied_tags = tid, f"post {tid}", f"u/{tid}", []
+        self.created_at = self.archive_timestamp = datetime(2024, 1, 1, tzinfo=timezone.utc) + timedelta(days=days)
+        self.archived, self.message_count, self.last_message, self.starter_message = True, 1, None, None
+        self.owner, self.owner_id, self._content, self._delay = None, 1, content, delay
+
+    async def fetch_message(self, mid):
+        await asyncio.sleep(self._delay)
+        return _Msg(mid, self._content)
+
+
+class _Forum:
+    def __init__(self, archived):
+        self.id, self.name, self.mention, self.available_tags = 99, "forum", "#forum", []
+        self.guild, self._archived, self.fetched = types.SimpleNamespace(id=1), archived, 0
+
+    async def active_threads(self):
+        return []
+
+    async def archived_threads(self, **kw):
+        for t in self._archived:
+            self.fetched += 1
+            await asyncio.sleep(0)
+            yield t
+
+
+def _cog():
+    bot = types.SimpleNamespace(config={}, cache=None, loop=asyncio.get_running_loop(), is_closed=lambda: False)
+    return Search(bot)
+
+
+def test_cancelled_search_leaves_no_tasks_behind():
+    async def run():
+        cog = _cog()
+        forum = _Forum([_Thread(i + 1, delay=0.01) for i in range(500)])
+        task = asyncio.create_task(cog._search_ths(forum, await cog._build_conds(None, search_word="body"), asyncio.Event()))
+        await asyncio.sleep(0.05)
+        task.cancel()
+        try:
+            await task
+        except asyncio.CancelledError:
+            pass
+        await asyncio.sleep(0.05)
+        cog._cct.cancel()
+        return [t for t in asyncio.all_tasks() if t is not asyncio.current_task()]
+
+    assert asyncio.run(run()) == []
+
+
+def _forum_channel(cid, name):
+    ch = discord.ForumChannel.__new__(discord.ForumChannel)
+    ch.id, ch.name = cid, name
+    return ch
+
+
+def test_forum_option_autocompletes_and_resolves():
+    async def run():
+        cog = _cog()
+        cog._cct.cancel()
+        help_desk, ideas = _forum_channel(5, "Help-Desk"), _forum_channel(6, "ideas")
+        chans = {5: help_desk, 6: ideas}
+        guild = types.SimpleNamespace(id=1, channels=[ideas, help_desk], get_channel=chans.get)
+        intr = types.SimpleNamespace(guild=guild, user=types.SimpleNamespace(id=7))
+        choices = await cog.forum_ac(intr, "HELP")
+        assert [(c.name, c.value) for c in choices] == [("#Help-Desk", "5")]
+        assert cog._res_forum(guild, "5") is help_desk
+        assert cog._res_forum(guild, "#Ideas") is ideas
+        assert cog._res_forum(guild, "missing") is None
+
+    asyncio.run(run())
+
+
+def test_parse_dt_on_forms():
+    d = date(2024, 2, 15)
+    utc = lambda *a: datetime(*a, tzinfo=timezone.utc)
+    assert _parse_dt_on("2024-01-05", d) == utc(2024, 1, 5)
+    assert _parse_dt_on("jan 05 2024", d) == utc(2024, 1, 5)
+    assert _parse_dt_on("05.01.2024", d) == utc(2024, 1, 5)
+    assert _parse_dt_on("today", d) == utc(2024, 2, 15)
+    assert _parse_dt_on("yesterday", d) == utc(2024, 2, 14)
+    assert _parse_dt_on("2w", d) == utc(2024, 2, 1)
+    assert _parse_dt_on("3m", d) == utc(2023, 11, 1)
+    assert _parse_dt_on("1y", d) == utc(2023, 2, 15)
+    assert _parse_dt_on("2024-02-30", d) is None
+    assert _parse_dt_on("soon", d) is None
+
+
+def test_thread_cache_keeps_unchanged_archived_threads_past_ttl(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(search_mod.time, "monotonic", lambda: now[0])
+    tc = ThreadCache(ttl=10, maxsize=3)
+    arc, act = types.SimpleNamespace(ia=True), types.SimpleNamespace(ia=False)
+    tc.store(1, arc, "a1")
+    tc.store(2, act, "a2")
+    assert tc.get(1, "a1") is arc and tc.get(2, "a2") is act
+    assert tc.get(1, "changed") is None
+    now[0] += 11
+    assert tc.get(1, "a1") is arc
+    assert tc.get(2, "a2") is None
+    tc.store(3, act, None)
+    assert tc.get(1, "a1") is None  # at capacity, expired entries are no longer served
+
+
+def test_thread_cache_cleanup_pops_expired_prefix(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(search_mod.time, "monotonic", lambda: now[0])
+    tc = ThreadCache(ttl=10, maxsize=2)
+    tc._stats_cache[1] = (now[0], (1, 1))
+    tc.store(1, types.SimpleNamespace(ia=True), None)
+    now[0] += 5
+    tc._stats_cache[2] = (now[0], (2, 2))
+    tc.store(2, types.SimpleNamespace(ia=True), None)
+    assert tc.cleanup() == 0  # throttled to once a minute
+    now[0] += 60
+    tc._stats_cache[3] = (now[0], (3, 3))
+    assert tc.cleanup() == 4
+    assert list(tc._stats_cache) == [3] and not tc._cache
+
+
+def test_thread_cache_cleanup_leaves_records_below_capacity(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(search_mod.time, "monotonic", lambda: now[0])
+    tc = ThreadCache(ttl=10, maxsize=5)
+    tc.store(1, types.SimpleNamespace(ia=True), None)
+    now[0] += 61
+    assert tc.cleanup() == 0 and 1 in tc._cache
+
+
+def test_newest_search_stops_reading_archives_once_first_pages_are_settled():
+    async def run():
+        cog = _cog()
+        cog._cct.cancel()
+        n = 2000
+        threads = [_Thread(i + 1, days=i) for i in reversed(range(n))]  # newest archived first
+        forum = _Forum(threads)
+        res, partial = await cog._search_ths(forum, await cog._build_conds(None, search_word="body", order="newest"), asyncio.Event())
+        return forum.fetched, res, partial
+
+    fetched, res, partial = asyncio.run(run())
+    cap = MESSAGES_PER_PAGE * EARLY_STOP_PAGES
+    assert partial and fetched < 2000
+    assert [r.tid for r in res[:cap]] == list(range(2000, 2000 - cap, -1))
+
+
+def test_oldest_search_reads_every_archive():
+    async def run():
+        cog = _cog()
+        cog._cct.cancel()
+        forum = _Forum([_Thread(i + 1, days=i) for i in reversed(range(300))])
+        res, partial = await cog._search_ths(forum, await cog._build_conds(None, search_word="body", order="oldest"), asyncio.Event())
+        return forum.fetched, res, partial
+
+    fetched, res, partial = asyncio.run(run())
+    assert fetched == 300 and len(res) == 300 and not partial
+
+
+def _http_error(status, headers=None):
+    return types.SimpleNamespace(status=status, response=types.SimpleNamespace(headers=headers or {}))
+
+
+def test_retry_delay():
+    assert _retry_delay(_http_error(429, {"Retry-After": "2.5"}), 0) == 2.5
+    assert _retry_delay(_http_error(429, {"Retry-After": "30"}), 0) == 10.0
+    assert _retry_delay(_http_error(429), 1) == 2.0
+    assert _retry_delay(types.SimpleNamespace(status=429, response=None), 0) == 1.0
+    assert _retry_delay(_http_error(503), 2) == 4.0
+    assert _retry_delay(_http_error(503), 6) == 10.0
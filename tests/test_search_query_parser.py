@@ -0,0 +1,17 @@
+from utils.search_query_parser import compile_all_keywords, compile_keywords
+
+
+def test_compile_all_keywords_requires_every_keyword():
+    p = compile_all_keywords(["foo", "bar"])
+    assert p.match("BAR then\nfoo")
+    assert not p.match("only foo here")
+    assert compile_all_keywords(["a.b"]).match("x a.b")
+    assert not compile_all_keywords(["a.b"]).match("axb")
+    assert compile_all_keywords(["foo", "foo"]).pattern.count("foo") == 1
+    assert compile_all_keywords([]) is None
+
+
+def test_compile_keywords_matches_any_keyword():
+    p = compile_keywords(["foo", "bar"])
+    assert p.search("xx BAR") and not p.search("baz")
+    assert compile_keywords([]) is None
@@ -1,5 +1,22 @@
 import logging
-from typing import Dict, List
+import re
+from typing import Dict, List, Optional, Pattern, Sequence
+
+def compile_keywords(keywords: Sequence[str]) -> Optional[Pattern]:
+    """Compile keywords into one case-insensitive alternation so a single pass over
+    the raw content finds any of them without lowercasing it first"""
+    if not keywords:
+        return None
+    # Longest first so overlapping needles prefer the most specific match
+    ordered = sorted(set(keywords), key=len, reverse=True)
+    return re.compile("|".join(re.escape(k) for k in ordered), re.IGNORECASE)
+
+def compile_all_keywords(keywords: Sequence[str]) -> Optional[Pattern]:
+    """Compile keywords into one case-insensitive pattern of lookaheads that matches
+    (with ``match``) only when every keyword occurs somewhere in the content"""
+    if not keywords:
+        return None
+    return re.compile("".join(f"(?=.*?{re.escape(k)})" for k in dict.fromkeys(keywords)), re.IGNORECASE | re.DOTALL)
 
 class SearchQueryParser:
     """Parses search queries with support for AND, OR, NOT operators and exact phrases"""
@@ -191,13 +208,14 @@ class SearchQueryParser:
         self._logger.warning(f"[boundary:error] Failed to parse query with {len(tokens)} tokens")
         return {"type": "error", "message": "Unable to parse query"}
     
-    def evaluate(self, syntax_tree: Dict, content: str) -> bool:
+    def evaluate(self, syntax_tree: Dict, content: str, content_lower: Optional[str] = None) -> bool:
         """Test if content matches the query conditions"""
         if not content:
             return False
-            
-        content_lower = content.lower()
-        
+        return self._evaluate_node(syntax_tree, content_lower if content_lower is not None else content.lower())
+
+    def _evaluate_node(self, syntax_tree: Dict, content_lower: str) -> bool:
+        """Evaluate a syntax tree node against already-lowercased content"""
         # Handle node types
         tree_type = syntax_tree["type"]
         
@@ -208,13 +226,13 @@ class SearchQueryParser:
             return syntax_tree["value"] in content_lower
             
         if tree_type == "and":
-            return all(self.evaluate(child, content) for child in syntax_tree["children"])
+            return all(self._evaluate_node(child, content_lower) for child in syntax_tree["children"])
             
         if tree_type == "or":
-            return any(self.evaluate(child, content) for child in syntax_tree["children"])
+            return any(self._evaluate_node(child, content_lower) for child in syntax_tree["children"])
             
         if tree_type == "not":
-            return not self.evaluate(syntax_tree["child"], content)
+            return not self._evaluate_node(syntax_tree["child"], content_lower)
             
         if tree_type == "error":
             self._logger.warning(f"[boundary:error] Search syntax error: {syntax_tree.get('message')}")
@@ -222,4 +240,4 @@ class SearchQueryParser:
             
         # Unknown type
         self._logger.warning(f"[boundary:error] Unknown syntax node type: {tree_type}")
-        return False 
\ No newline at end of file
+        return False